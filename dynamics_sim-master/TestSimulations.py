@@ -2,9 +2,12 @@
 
 from wrapper import GameDynamicsWrapper, VariedGame
 from dynamics.wright_fisher import WrightFisher
+from dynamics.moran import Moran
 from games.example_games.hawk_dove import HawkDove
 from games.example_games.hdb import HawkDoveBourgeois
+from payoff_matrix import PayoffMatrix
 
+import numpy as np
 
 import unittest
 
@@ -33,5 +36,62 @@ class TestCase(unittest.TestCase):
         s = VariedGame(HawkDoveBourgeois, WrightFisher)
         s.vary_2params('v', (0, 50, 1), 'c', (0, 100, 1), num_iterations=1, num_gens=500, burn=499, graph=dict(type='contour', lineArray=[(0, 50, 0, 50)]))
 
+    def test_ragged_payoffs(self):  # Payoffs for player types with different numbers of strategies, checked by hand
+        pm = PayoffMatrix(2, [[[1, 2, 3], [4, 5, 6]], [[6, 5, 4], [3, 2, 1]]], 0, 0)
+        dyn = WrightFisher(payoff_matrix=pm, player_frequencies=(0.5, 0.5), pop_size=8)
+        state = [np.array([1, 3]), np.array([2, 1, 1])]
+        payoff, avg_group_payoff = dyn.calculate_payoffs(state)
+        fused_payoff, fitness, fused_avg_group_payoff = dyn.calculate_payoffs_and_fitnesses(state, 0.8)
+        for p in (payoff, fused_payoff):
+            self.assertTrue(np.allclose(p[0], [1.75, 4.75]))
+            self.assertTrue(np.allclose(p[1], [3.75, 2.75, 1.75]))
+        self.assertAlmostEqual(avg_group_payoff, 28 / 8.0)
+        self.assertAlmostEqual(fused_avg_group_payoff, 28 / 8.0)
+
+    def test_round_individuals(self):  # Leftovers go to the largest decimal parts, ties going to the lowest index
+        self.assertEqual(WrightFisher.round_individuals([1.5, 1.5, 1.0]), [2, 1, 1])
+        self.assertEqual(WrightFisher.round_individuals(np.array([0.5, 1.5, 1.5, 0.5])), [1, 2, 1, 0])
+        self.assertEqual(WrightFisher.round_individuals([0.4, 0.4, 0.4, 0.8]), [1, 0, 0, 1])
+
+    def test_seeded_simulation(self):  # Simulators constructed with the same seed step through the same states
+        game = HawkDoveBourgeois(**HawkDoveBourgeois.DEFAULT_PARAMS)
+        results = [Moran(payoff_matrix=game.pm, player_frequencies=game.player_frequencies, number_groups=2, rate=0.5, seed=3).simulate(num_gens=50) for _ in range(2)]
+        for a, b in zip(results[0][0] + results[0][1], results[1][0] + results[1][1]):
+            self.assertTrue(np.array_equal(a, b))
+
+    def test_fixation_start_state(self):  # A single focal player, with the rest spread evenly and the remainder last
+        game = HawkDoveBourgeois(**HawkDoveBourgeois.DEFAULT_PARAMS)
+        dyn = Moran(payoff_matrix=game.pm, player_frequencies=game.player_frequencies, seed=0)
+        strategies, payoffs = dyn.simulate(num_gens=1, fixation_probability=True, strategy_indx=0)
+        start = strategies[0][0]
+        # the same draw of the start state that the simulator makes, 33 players to distribute over two strategies
+        drawn = np.random.default_rng(0).multinomial(dyn.pop_size, [1. / 3] * 3, size=1)[0]
+        self.assertEqual(start[0], 1)
+        self.assertEqual(start.sum(), dyn.pop_size)
+        self.assertTrue(np.array_equal(start, [1, drawn[1] + 16, drawn[2] + 17]))
+
+    def test_simulate_many_parallel(self):  # Seeded runs give the same average whether or not they are parallelized
+        game = HawkDove(**HawkDove.DEFAULT_PARAMS)
+        dyn = Moran(payoff_matrix=game.pm, player_frequencies=game.player_frequencies, seed=3)
+        serial = dyn.simulate_many(num_iterations=4, num_gens=30, seed=1, parallelize=False)
+        parallel = dyn.simulate_many(num_iterations=4, num_gens=30, seed=1, parallelize=True)
+        for a, b in zip(serial[0] + serial[1], parallel[0] + parallel[1]):
+            self.assertTrue(np.array_equal(a, b))
+
+    def test_simulate_many_start_state(self):  # The caller's start state is left unchanged and starts every run
+        game = HawkDove(**HawkDove.DEFAULT_PARAMS)
+        dyn = Moran(payoff_matrix=game.pm, player_frequencies=game.player_frequencies, seed=3)
+        start_state = [[np.array([50, 50])]]
+        for parallelize in (False, True):
+            strategies, payoffs = dyn.simulate_many(num_iterations=4, num_gens=30, start_state=start_state, seed=1, parallelize=parallelize)
+            self.assertTrue(np.array_equal(start_state[0][0], [50, 50]))
+            self.assertTrue(np.array_equal(strategies[0][0], [50, 50]))
+
+    def test_player_counts(self):  # Precomputed player counts are used as is and set the population size
+        game = HawkDove(**HawkDove.DEFAULT_PARAMS)
+        dyn = Moran(payoff_matrix=game.pm, player_frequencies=game.player_frequencies, player_counts=[30])
+        self.assertEqual(dyn.num_players, [30])
+        self.assertEqual(dyn.pop_size, 30)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,14 +1,26 @@
 __author__ = 'elubin'
 from abc import ABCMeta, abstractmethod
-import heapq
 import math
 import numpy as np
-import random
-from itertools import chain
+from parallel import par_for, delayed, dynamics_simulate
 # The precision of the decimal comparison operations this should not need any changing
 DECIMAL_PRECISION = 5
 
 
+def _fit_exp(payoff, w):
+    """
+    The default fitness function for stochastic dynamics, e^(payoff * w), applied element-wise.
+    """
+    return np.exp(payoff * w)
+
+
+def _fit_lin(payoff, w):
+    """
+    The default fitness function for deterministic dynamics, payoff * w, applied element-wise.
+    """
+    return payoff * w
+
+
 class DynamicsSimulator(object):
     """
     An abstract class that is used as the super class for all dynamics simulations, both stochastic and deterministic.
@@ -17,7 +29,9 @@ class DynamicsSimulator(object):
     """
     __metaclass__ = ABCMeta
 
-    def __init__(self, payoff_matrix, player_frequencies, number_groups=1, pop_size=100, rate=0.01, stochastic=True, uniDist=False, fitness_func= None, selection_strengthI=0.8, selection_strengthG=0.8):
+    _player_counts_cache = {}  #: the rounded number of players of each type, by (pop_size, player_frequencies)
+
+    def __init__(self, payoff_matrix, player_frequencies, number_groups=1, pop_size=100, rate=0.01, stochastic=True, uniDist=False, fitness_func= None, selection_strengthI=0.8, selection_strengthG=0.8, validate=__debug__, seed=None, player_counts=None):
         """
         The constructor for the abstract class. This doesn't need to be called directly, as it is called by @see
         L{GameDynamicsWrapper}
@@ -43,8 +57,17 @@ class DynamicsSimulator(object):
         @type selection_strength: float
         @param selection_strengthG: the selection strength that will be used in the fitness function at the group level
         @type selection_strength: float
+        @param validate: whether or not to validate the state of every group after each generation, by default only
+            when assertions are enabled
+        @type validate: bool
+        @param seed: the seed of the simulator's random number generator, random if None
+        @type seed: int or numpy.random.SeedSequence or None
+        @param player_counts: an optional list of the number of players of each type in every group, used as is instead
+            of rounding the player frequencies, in which case pop_size is their sum. Each count must be within one
+            player of its share of the population according to player_frequencies
+        @type player_counts: iterable or None
         """
-        assert math.fsum(player_frequencies) == 1.0
+        assert abs(sum(player_frequencies) - 1.0) < 10**-DECIMAL_PRECISION
 
         assert pop_size >= 0
         # The total population gets divided equally among the groups only when the population size is larger than
@@ -52,8 +75,18 @@ class DynamicsSimulator(object):
         if pop_size > number_groups:
             pop_size = int(pop_size/number_groups)
 
+        if player_counts is not None:
+            pop_size = sum(player_counts)
+            assert pop_size > 0
+            assert len(player_counts) == len(player_frequencies)
+            for n, x in zip(player_counts, player_frequencies):
+                assert abs(n - pop_size * x) < 1, "the player counts must be a rounding of the player frequencies"
+
         if pop_size > 0:
-            self.num_players = self.round_individuals([pop_size * x for x in player_frequencies])
+            if player_counts is not None:
+                self.num_players = [int(n) for n in player_counts]
+            else:
+                self.num_players = self._player_counts(pop_size, player_frequencies)
             assert sum(self.num_players) == pop_size
             self.infinite_pop_size = False
             self.uniDist = uniDist
@@ -68,12 +101,32 @@ class DynamicsSimulator(object):
         self.stochastic = stochastic
         self.selection_strengthI = selection_strengthI
         self.selection_strengthG = selection_strengthG
-        if fitness_func is None:
-            if stochastic:
-                fitness_func = lambda p, w: math.e**(p*w)
-            else:
-                fitness_func = lambda p, w: p*w
-        self.fitness_func = lambda payoff, w: float(fitness_func(payoff, w))
+        self._validate = validate
+        # All the randomness of the simulation is drawn from this generator, so that simulators can be seeded and run
+        # independently of each other
+        self.rng = np.random.default_rng(seed)
+        # Bind the function that maps an array of payoffs to fitnesses once: a single ufunc expression for the default
+        # stochastic or deterministic fitness function, or else the user supplied one applied to each payoff in turn
+        if fitness_func is not None:
+            self._fit_vec = lambda payoff, w: np.fromiter((fitness_func(p, w) for p in payoff), np.float64, len(payoff))
+        elif stochastic:
+            self._fit_vec = _fit_exp
+        else:
+            self._fit_vec = _fit_lin
+        # The shape of the game is fixed, so keep local copies of it rather than looking it up on the payoff matrix
+        self._num_player_types = int(payoff_matrix.num_player_types)
+        self._num_strats = np.asarray(payoff_matrix.num_strats, dtype=np.intp)
+        # Offsets at which each player type's strategies end (and the next one's start) in the flattened array of all
+        # strategies
+        self._strats_cumsum = np.cumsum(self._num_strats)
+        self._strat_offsets = self._strats_cumsum[:-1]
+        self._strat_slices = [slice(start, end) for start, end in zip([0] + self._strat_offsets.tolist(),
+                                                                      self._strats_cumsum.tolist())]
+        # Player types may have different numbers of strategies, so dense per player type arrays are padded up to the
+        # largest number of strategies, and the mask selects the entries that correspond to actual strategies
+        self._max_strats = int(self._num_strats.max())
+        self._strat_mask = np.arange(self._max_strats) < self._num_strats[:, np.newaxis]
+        self._uniform_strats = bool(self._strat_mask.all())
 
 
     @abstractmethod
@@ -105,14 +158,14 @@ class DynamicsSimulator(object):
         @return: whether or not the state is valid
         @rtype: bool
         """
-        assert len(s) == self.pm.num_player_types
-        for i, (p, expected, n_strats) in enumerate(zip(s, self.num_players, self.pm.num_strats)):
+        assert len(s) == self._num_player_types
+        for i, (p, expected, n_strats) in enumerate(zip(s, self.num_players, self._num_strats)):
             if isinstance(p, (list, tuple)):
                 p = np.array(p)
                 s[i] = p
 
             assert isinstance(p, np.ndarray)
-            assert p.sum() == expected
+            assert abs(p.sum() - expected) < 10**-DECIMAL_PRECISION
             assert len(p) == n_strats
 
         return s
@@ -130,8 +183,8 @@ class DynamicsSimulator(object):
         @type: bool
         @param strategy_indx: Strategy whose fixation probability is to be computed.
         @type: int
-        @return: the list of states that the simulation steps through in each generation
-        @rtype: list(list(nxm array)) where n:number of player types,m:number of strategies, list over the number of groups.
+        @return: the strategy distributions and the payoffs, averaged across groups, at each generation
+        @rtype: tuple(list(nxm array)) where n:number of generations,m:number of strategies, list over the player types.
         """
         if self.number_groups > 1:
             group_selection = True
@@ -140,72 +193,136 @@ class DynamicsSimulator(object):
 
         # Set up the start state if not specified and validate it otherwise
         if start_state is None:
-            start_state=[]
+            # Each player type's distribution is drawn for all groups at once, with one row per group
+            size = self.number_groups
             if not self.infinite_pop_size:
                 if self.uniDist:
-                    distribution_for_player = lambda n_p, n_s: np.random.uniform(0, 1, n_s)
+                    distribution_for_player = lambda n_p, n_s: self.rng.uniform(0, 1, (size, n_s))
                 else:
-                    distribution_for_player = lambda n_p, n_s: np.random.multinomial(n_p, [1./n_s] * n_s)
+                    distribution_for_player = lambda n_p, n_s: self.rng.multinomial(n_p, [1./n_s] * n_s, size=size)
             else:
-                distribution_for_player = lambda n_p, n_s: np.random.dirichlet([1] * n_s) * n_p
-            for i in range(self.number_groups):
-                start_state.append([distribution_for_player(n_p, n_s) for n_p, n_s in zip(self.num_players, self.pm.num_strats)])
+                distribution_for_player = lambda n_p, n_s: self.rng.dirichlet([1] * n_s, size=size) * n_p
+            draws = [distribution_for_player(n_p, n_s) for n_p, n_s in zip(self.num_players, self._num_strats)]
+            start_state = [[player_draws[i] for player_draws in draws] for i in range(self.number_groups)]
 
             # Modify the start state in order to compute the fixation probability
             if fixation_probability:
                 assert self.number_groups ==1, ('Fixation probability can only be computed for one group')
-                players_to_distribute = start_state[0][0][strategy_indx] - 1
+                focal_state = start_state[0][0]
+                players_to_distribute = focal_state[strategy_indx] - 1
 
                 # There is only one individual playing the strategy whose fixation probability has to be computed.
-                start_state[0][0][strategy_indx] = 1
-
-                # Distribute rest of the players amongst other strategies making sure the total population size is fixed.
-                player_dist = []
-                number_divisions = len(start_state[0][0]) - 1
-                count = 0
-                for i in range(number_divisions):
-                    if i != number_divisions - 1 :
-                        div = int(players_to_distribute/number_divisions)
-                        count += div
-                        player_dist.append(div)
-                    else:
-                        player_dist.append(players_to_distribute-count)
-                player_dist.insert(strategy_indx,0)
-                for i in range(len(start_state[0][0])):
-                    if i != strategy_indx:
-                        start_state[0][0][i] += player_dist[i]
-                        players_to_distribute -= player_dist
+                focal_state[strategy_indx] = 1
+
+                # Distribute rest of the players evenly amongst other strategies, with the remainder going to the last one,
+                # making sure the total population size is fixed.
+                number_divisions = len(focal_state) - 1
+                div = int(players_to_distribute / number_divisions)
+                player_dist = np.full(number_divisions, div, dtype=focal_state.dtype)
+                player_dist[-1] += players_to_distribute - div * number_divisions
+                focal_state[np.arange(len(focal_state)) != strategy_indx] += player_dist
 
         else:
             assert len(start_state)==self.number_groups
+            # Work on a copy, the dynamics update the state arrays in place and the caller's start state (which
+            # simulate_many shares between all of its simulations) must not change
+            start_state = [[np.array(p) for p in group] for group in start_state]
             for i in range(self.number_groups):
                 start_state[i] = self.validate_state(start_state[i])
 
-        # Setting the initial payoffs to zero
-        initial_payoffs = []
-        for i in range(self.number_groups):
-            initial_payoffs.append([0*np.random.uniform(0, 1, n_s) for n_p, n_s in zip(self.num_players, self.pm.num_strats)])
+        strategies, payoffs = self._run_loop(start_state, num_gens, group_selection)
+
+        # Create lists that contain the total normalized frequency and payoffs associated with each player type across groups per time step
+        strategies_total = [strategies[:num_gens, :, k, :n_s].mean(axis=1) for k, n_s in enumerate(self._num_strats)]
+        payoffs_total = [payoffs[:num_gens, :, k, :n_s].mean(axis=1) for k, n_s in enumerate(self._num_strats)]
+
+        return strategies_total, payoffs_total
+
+
+    def simulate_many(self, num_iterations, num_gens=100, start_state=None, fixation_probability=False, strategy_indx=0, seed=None, parallelize=True):
+        """
+        Run num_iterations independent simulations of the given number of generations and average their results.
+        Simulations are parallelized across all available cores, each seeded with its own child of the given seed, or
+        of a seed drawn from the simulator's own generator if none is given.
+
+        @param num_iterations: the number of independent simulations to run
+        @type num_iterations: int
+        @param num_gens: the number of iterations of each simulation.
+        @type num_gens: int
+        @param start_state: An optional list of distributions of strategies for each player.
+        @type start_state: list or None
+        @param fixation_probability: Whether the given simulation is to compute the fixation probability for a strategy.
+        @type: bool
+        @param strategy_indx: Strategy whose fixation probability is to be computed.
+        @type: int
+        @param seed: the seed from which the seeds of the individual simulations are spawned. If None it is drawn from
+            the simulator's generator, so that simulators constructed with the same seed give the same results
+        @type seed: int or None
+        @param parallelize: whether or not to parallelize the simulations
+        @type parallelize: bool
+        @return: the strategy distributions and the payoffs averaged across groups and simulations, at each generation
+        @rtype: tuple(list(nxm array)) where n:number of generations,m:number of strategies, list over the player types.
+        """
+        if seed is None:
+            seed = int(self.rng.integers(2**63))
+        seeds = np.random.SeedSequence(seed).spawn(num_iterations)
+        output = par_for(parallelize)(delayed(dynamics_simulate)(self, s, num_gens, start_state, fixation_probability, strategy_indx) for s in seeds)
+
+        strategies_total = [np.mean(np.stack([strategies[k] for strategies, payoffs in output]), axis=0) for k in range(self._num_player_types)]
+        payoffs_total = [np.mean(np.stack([payoffs[k] for strategies, payoffs in output]), axis=0) for k in range(self._num_player_types)]
+
+        return strategies_total, payoffs_total
+
+    def _run_loop(self, start_state, num_gens, group_selection):
+        """
+        Step the simulation through the given number of generations from the start state, recording the strategy
+        distribution and payoffs of every group at each generation.
 
-        # Store the strategy frequencies and payoffs received at each time step
-        strategies=[start_state]
-        payoffs=[initial_payoffs]
+        @param start_state: the distribution of strategies for each player, one list per group
+        @type start_state: list(list(numpy.ndarray))
+        @param num_gens: the number of iterations of the simulation
+        @type num_gens: int
+        @param group_selection: whether the simulation is incorporating group selection
+        @type group_selection: bool
+        @return: the strategy and payoff history, arrays indexed by generation, group, player type and strategy
+        @rtype: tuple(numpy.ndarray)
+        """
+        # Store the strategy frequencies and payoffs received at each time step as one contiguous array indexed by
+        # generation, group, player type and strategy, padded for player types with fewer strategies. The payoffs of
+        # the start state are zero.
+        strategies = np.zeros((num_gens + 1, self.number_groups) + self._strat_mask.shape)
+        payoffs = np.zeros_like(strategies)
+        self._store(strategies[0], start_state)
 
         # Actual simulation consisting of two levels of dynamics, one at the level of the group and one in between the groups.
         for i in range(num_gens):
             r,p=self.next_generation(start_state,group_selection,self.rate)
-            strategies.append(np.array([r[j] for j in range(self.number_groups)],dtype=object))
-            payoffs.append(np.array([p[j] for j in range(self.number_groups)],dtype=object))
-            start_state=strategies[i+1]
-            for j in range(self.number_groups):
-                start_state[j] = self.validate_state(start_state[j])
+            self._store(strategies[i+1], r)
+            self._store(payoffs[i+1], p)
+            start_state = [self._unpad(group) for group in strategies[i+1]]
+            if self._validate:
+                for j in range(self.number_groups):
+                    start_state[j] = self.validate_state(start_state[j])
 
+        return strategies, payoffs
 
-        # Create lists that contain the total normalized frequency and payoffs associated with each player type across groups per time step
-        strategies_total=[np.array([sum(np.array(strategies[i][j][k]) for j in range(self.number_groups))/self.number_groups for i in range(num_gens)]) for k in range(self.pm.num_player_types)]
-        payoffs_total=[np.array([sum(np.array(payoffs[i][j][k]) for j in range(self.number_groups))/self.number_groups for i in range(num_gens)]) for k in range(self.pm.num_player_types)]
-
-        return strategies_total, payoffs_total
+    @classmethod
+    def _player_counts(cls, pop_size, player_frequencies):
+        """
+        The number of players of each type in a group of the given size, memoized across instances since sweeps
+        construct many simulators with the same population.
 
+        @param pop_size: the number of players in a group
+        @type pop_size: int
+        @param player_frequencies: the relative frequency of each type of player
+        @type player_frequencies: iterable
+        @return: the rounded number of players of each type
+        @rtype: list(int)
+        """
+        key = (pop_size, tuple(player_frequencies))
+        if key not in cls._player_counts_cache:
+            cls._player_counts_cache[key] = tuple(cls.round_individuals([pop_size * x for x in player_frequencies]))
+        return list(cls._player_counts_cache[key])
 
     @staticmethod
     def round_individuals(unrounded_frequencies):
@@ -220,6 +337,10 @@ class DynamicsSimulator(object):
         @return: an iterable of frequencies of the same length, that sums to the same total.
         @rtype: iterable
         """
+        # the inputs are a handful of strategies, so plain python floats beat numpy here; an array is converted once
+        # rather than iterated element by element
+        if isinstance(unrounded_frequencies, np.ndarray):
+            unrounded_frequencies = unrounded_frequencies.tolist()
         unrounded_total = math.fsum(unrounded_frequencies)
         total = int(round(unrounded_total, DECIMAL_PRECISION))
 
@@ -227,27 +348,74 @@ class DynamicsSimulator(object):
 
         diff = total - sum(int_num_senders)
         if diff > 0:
-            # note the difference needs to be negative, because heapq's only implement a minimum priority queue but
-            # we want max priority queue
-            thresh = [((x - y), i) for i, (x, y) in enumerate(zip(int_num_senders, unrounded_frequencies))]
-            heapq.heapify(thresh)
-            while diff > 0:
-                v, i = heapq.heappop(thresh)
+            # the leftovers go to the diff entries with the largest decimal parts, ties going to the lowest index, which
+            # python's stable sort on the negated decimal parts selects directly
+            fractions = [x - y for x, y in zip(unrounded_frequencies, int_num_senders)]
+            for i in sorted(range(len(fractions)), key=lambda i: -fractions[i])[:diff]:
                 int_num_senders[i] += 1
-                diff -= 1
         assert sum(int_num_senders) == total, "the total number of individuals after rounding must be the same as before rounding"
         return int_num_senders
 
+    def _pad(self, rows):
+        """
+        Pack a ragged list with one entry per player type into a dense (player types x max strategies) array, with
+        zeros in place of the strategies that a player type does not have.
+
+        @param rows: a list of iterables, one per player type, with one entry per strategy
+        @type rows: list
+        @return: the padded array
+        @rtype: numpy.ndarray
+        """
+        dense = np.zeros(self._strat_mask.shape)
+        dense[self._strat_mask] = np.concatenate(rows)
+        return dense
+
+    def _store(self, dest, groups):
+        """
+        Write a list of group states (or payoffs), each a list with one array per player type, into a dense
+        (groups x player types x max strategies) slice of the simulation history. When every player type has the same
+        number of strategies this is a single assignment, otherwise it is one assignment per player type.
+
+        @param dest: the slice of the history to write into, whose padding entries are left untouched
+        @type dest: numpy.ndarray
+        @param groups: the per group, per player type values
+        @type groups: list(list(numpy.ndarray))
+        """
+        if self._uniform_strats:
+            dest[...] = groups
+        else:
+            for k, n_s in enumerate(self._num_strats):
+                dest[:, k, :n_s] = [group[k] for group in groups]
+
+    def _unpad(self, dense):
+        """
+        The inverse of L{_pad}, split a dense (player types x max strategies) array back into one array per player type.
+
+        @param dense: the padded array
+        @type dense: numpy.ndarray
+        @return: one array per player type, with one entry per strategy
+        @rtype: list(numpy.ndarray)
+        """
+        return np.split(dense[self._strat_mask], self._strat_offsets)
+
     def calculate_payoffs(self, state):
         """
+        Calculate the expected payoff of playing each strategy for each player given the state of a group, as well as
+        the average payoff of all members of the group.
+
+        @param state: The current distribution of players playing each strategy for each player
+        @type state: list(list())
+        @return: a 2D array of the payoff of playing each strategy for each player, and the average group payoff
+        @rtype: tuple(list(list()), float)
         """
         payoff = [[self.pm.get_expected_payoff(p_idx, s_idx, state)
                        for s_idx in range(num_strats_i)]
-                      for p_idx, num_strats_i in enumerate(self.pm.num_strats)]
-
+                      for p_idx, num_strats_i in enumerate(self._num_strats)]
 
-        # Average payoff of all members in a group. Lengths could be written better?
-        avg_group_payoff = sum([payoff[i][j]*state[i][j] for i in range(len(payoff)) for j in range(len(payoff[0]))])/sum(chain(*state))
+        # Average payoff of all members in a group, as a single reduction over the padded payoff and state arrays
+        payoff_arr = self._pad(payoff)
+        state_arr = self._pad(state)
+        avg_group_payoff = np.einsum('ij,ij->', payoff_arr, state_arr) / state_arr.sum()
 
         return payoff, avg_group_payoff
 
@@ -259,11 +427,37 @@ class DynamicsSimulator(object):
 
         @param state: The current distribution of players playing each strategy for each player
         @type state: list(list())
-        @return: a 2D array representing the fitness of playing each strategy for each player
-        @rtype: list(list())
+        @return: an array representing the fitness of playing each strategy, for each player
+        @rtype: list(numpy.ndarray)
         """
-        # Calculate fitness for each individual in the population (based on what strategy they are playing)
-        fitness = [[self.fitness_func(p,selection_strength) for p in j] for j in payoff]
-
+        # Calculate fitness for each individual in the population (based on what strategy they are playing), one array
+        # operation per player type
+        fitness = [self._fit_vec(np.asarray(p, dtype=np.float64), selection_strength) for p in payoff]
 
         return fitness
+
+    def calculate_payoffs_and_fitnesses(self, state, selection_strength):
+        """
+        The combination of L{calculate_payoffs} and L{calculate_fitnesses} in a single pass: the expected payoffs of all
+        strategies of all player types are built into one flat array, from which the average group payoff and the
+        fitnesses are computed before splitting them back up by player type.
+
+        @param state: The current distribution of players playing each strategy for each player
+        @type state: list(list())
+        @param selection_strength: the selection strength that will be used in the fitness function
+        @type selection_strength: float
+        @return: the payoff and the fitness of playing each strategy for each player, and the average group payoff
+        @rtype: tuple(list(numpy.ndarray), list(numpy.ndarray), float)
+        """
+        get_expected_payoff = self.pm.get_expected_payoff
+        flat_payoff = np.array([get_expected_payoff(p_idx, s_idx, state)
+                                for p_idx, num_strats_i in enumerate(self._num_strats) for s_idx in range(num_strats_i)])
+
+        flat_state = state[0] if self._num_player_types == 1 else np.concatenate(state)
+        avg_group_payoff = np.dot(flat_payoff, flat_state) / flat_state.sum()
+
+        flat_fitness = self._fit_vec(flat_payoff, selection_strength)
+        payoff = [flat_payoff[sl] for sl in self._strat_slices]
+        fitness = [flat_fitness[sl] for sl in self._strat_slices]
+
+        return payoff, fitness, avg_group_payoff
@@ -31,38 +31,31 @@ class Moran(DynamicsSimulator):
         avg_payoffs = []
         fitness = []
         for i in range(number_groups):
-            p, avg_p = self.calculate_payoffs(previous_state[i])
+            p, f, avg_p = self.calculate_payoffs_and_fitnesses(previous_state[i], self.selection_strengthI)
             payoff.append(p)
             avg_payoffs.append(avg_p)
-            fitness.append(self.calculate_fitnesses(payoff[i], self.selection_strengthI))
+            fitness.append(f)
 
-        total_fitness_per_player_type = [[] for i in range(len(previous_state[0]))] # This length could be written better.
-        for i in range(len(previous_state[0])):
-            for j in range(len(previous_state)):
-                for k in range(len(fitness[j][i])):
-                    total_fitness_per_player_type[i].append(fitness[j][i][k]*next_state[j][i][k])
+        # Fitness weighted by the number of players for each player type, across the strategies of all groups
+        total_fitness_per_player_type = [np.concatenate([fitness[j][i] * next_state[j][i] for j in range(number_groups)])
+                                         for i in range(len(previous_state[0]))]
 
         # Creating the mutation matrix
         if type(self.mu) == float:
-            mu_matrix = []
-            for i in range(len(payoff[0])):
-                mu_matrix.append(self.mu*np.ones(len(payoff[0][i])))
+            mu_matrix = [self.mu*np.ones(n_s) for n_s in self._num_strats]
         else:
             mu_matrix = self.mu
 
         # Moran at the group level
-        if group_selection and np.random.uniform(0,1)<rate:
-
-            avg_fitness = []
+        if group_selection and self.rng.uniform(0,1)<rate:
 
             # Calculate the fitness of each group based on their average payoffs
-            for k in range(len(avg_payoffs)):
-                avg_fitness.append(self.fitness_func(avg_payoffs[k], self.selection_strengthG))
+            avg_fitness = self._fit_vec(np.asarray(avg_payoffs, dtype=np.float64), self.selection_strengthG)
 
             # Pick the group that will reproduce and the one that it replaces
-            reproduction = np.random.multinomial(1,[x / sum(avg_fitness) for x in avg_fitness])
+            reproduction = self.rng.multinomial(1, avg_fitness / avg_fitness.sum())
             reproduction_index = np.nonzero(reproduction)[0][0]
-            replacement_event = np.random.randint(0,number_groups)
+            replacement_event = self.rng.integers(0,number_groups)
             next_state[replacement_event] = next_state[reproduction_index]
         else:
 
@@ -72,9 +65,8 @@ class Moran(DynamicsSimulator):
 
             # For each player-type pick one individual from one group to reproduce
             for i in range(len(total_fitness_per_player_type)):
-                weighted_total = sum(total_fitness_per_player_type[i])
-                dist = np.array([f_i/weighted_total for f_i in total_fitness_per_player_type[i]])
-                sample = np.random.multinomial(1,dist)
+                dist = total_fitness_per_player_type[i] / total_fitness_per_player_type[i].sum()
+                sample = self.rng.multinomial(1,dist)
                 reproduce_index = np.nonzero(sample)[0][0]
                 player_strat = len(total_fitness_per_player_type[i])/number_groups
                 group.append(int(reproduce_index/player_strat))
@@ -86,14 +78,13 @@ class Moran(DynamicsSimulator):
                 mu_individual = mu_matrix[player_no][strat_no]
 
                 # Determine who dies
-                total = p.sum()
-                dist = [n_i / float(total) for n_i in p]
+                dist = p / float(p.sum())
 
                 # Chance of mutating while reproduction
-                if np.random.uniform(0,1)<mu_individual:
-                    strat_no = np.random.randint(0,len(p))
+                if self.rng.uniform(0,1)<mu_individual:
+                    strat_no = self.rng.integers(0,len(p))
                 p[strat_no] += 1
-                p -= np.random.multinomial(1, dist)
+                p -= self.rng.multinomial(1, dist)
             next_state[group_no][player_no] = p
 
         return next_state, fitness
@@ -0,0 +1,40 @@
+# Compiled kernels for the hot paths of the dynamics simulators. Numba is optional: if it is not installed the kernels
+# fall back to plain numpy, which computes the same values without the JIT compilation.
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """
+        No-op stand-in for numba.njit, supporting both the bare and the parametrized decorator forms.
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+
+@njit(cache=True)
+def replicator_step(distribution, fitnesses, generation_skip, num_players):
+    """
+    The replicator update of one player type's strategy distribution, rescaled to the number of players. Negative
+    entries are clipped to zero, and a distribution that vanishes entirely is reset to uniform.
+
+    @param distribution: the number of players playing each strategy
+    @type distribution: numpy.ndarray
+    @param fitnesses: the fitness of each strategy
+    @type fitnesses: numpy.ndarray
+    @param generation_skip: the number of time-steps included in each generation
+    @type generation_skip: float
+    @param num_players: the number of players of this type
+    @type num_players: float
+    @return: the unrounded distribution for the next generation
+    @rtype: numpy.ndarray
+    """
+    new_state = distribution + distribution * (fitnesses - np.mean(fitnesses)) * generation_skip
+    for i in range(new_state.shape[0]):
+        if new_state[i] < 0:
+            new_state[i] = 0.0
+    if new_state.sum() <= 0:
+        new_state = np.ones_like(new_state)  # Normalization in edge cases (to prevent negative or all 0 distributions)
+    return new_state * (num_players / new_state.sum())
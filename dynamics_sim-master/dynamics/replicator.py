@@ -1,4 +1,5 @@
 from dynamics.dynamics import DynamicsSimulator
+from dynamics.numba_kernels import replicator_step
 import numpy as np
 
 class Replicator(DynamicsSimulator):
@@ -23,29 +24,16 @@ class Replicator(DynamicsSimulator):
         avg_payoffs = []
         fitness = []
         for i in range(number_groups):
-            p, avg_p = self.calculate_payoffs(previous_state[i])
+            p, f, avg_p = self.calculate_payoffs_and_fitnesses(previous_state[i], self.selection_strengthI)
             payoff.append(p)
             avg_payoffs.append(avg_p)
-            fitness.append(self.calculate_fitnesses(payoff[i], self.selection_strengthI))
+            fitness.append(f)
             
         for i in range(number_groups):
             new_group_state =[]
             for pIndex, (fitnesses, stratDistribution, numPlayers) in enumerate(zip(fitness[i], previous_state[i], self.num_players)):
-                meanFitness = np.mean(fitnesses)
-            
-                new_player_state = np.zeros(len(fitnesses))
-                for stratIndex, (stratFitness, stratProportion) in enumerate(zip(fitnesses, stratDistribution)):
-                    dStrat = stratProportion * (stratFitness - meanFitness) * self.generation_skip
-                    new_player_state[stratIndex] = stratProportion + dStrat
-                
-                for i, strat in enumerate(new_player_state):
-                    if strat < 0:
-                        new_player_state[i] = 0
-                if new_player_state.sum() <= 0:
-                    for i in range(len(new_player_state)):
-                        new_player_state[i] = 1#Normalization in edge cases (to prevent negative distributions or all 0 distributions)
-                    
-                new_player_state *= float(numPlayers / new_player_state.sum())
+                new_player_state = replicator_step(np.asarray(stratDistribution, dtype=np.float64), fitnesses,
+                                                   float(self.generation_skip), float(numPlayers))
                 new_player_state = np.array(self.round_individuals(new_player_state))
                 new_group_state.append(new_player_state)
             next_state.append(new_group_state)
@@ -26,30 +26,25 @@ class WrightFisher(DynamicsSimulator):
         fitness = []
 
         for i in range(number_groups):
-            p, avg_p = self.calculate_payoffs(previous_state[i])
+            p, f, avg_p = self.calculate_payoffs_and_fitnesses(previous_state[i], self.selection_strengthI)
             payoff.append(p)
             avg_payoffs.append(avg_p)
-            fitness.append(self.calculate_fitnesses(payoff[i], self.selection_strengthI))
+            fitness.append(f)
 
         # Creating the mutation matrix
         if type(self.mu) == float:
-            mu_matrix = []
-            for i in range(len(payoff[0])):
-                mu_matrix.append(self.mu*np.ones(len(payoff[0][i])))
+            mu_matrix = [self.mu*np.ones(n_s) for n_s in self._num_strats]
         else:
             mu_matrix = self.mu
 
         # Wright-Fisher between groups
-        if group_selection and np.random.uniform(0,1)<rate:
-
-            avg_fitness = []
+        if group_selection and self.rng.uniform(0,1)<rate:
 
             # Calculate the fitness of each group based on their average payoffs
-            for k in range(len(avg_payoffs)):
-                avg_fitness.append(self.fitness_func(avg_payoffs[k], self.selection_strengthG))
+            avg_fitness = self._fit_vec(np.asarray(avg_payoffs, dtype=np.float64), self.selection_strengthG)
             # Groups reproduce proportional to their fitness
 
-            new_group_distribution = np.random.multinomial(number_groups,[x / sum(avg_fitness) for x in avg_fitness])
+            new_group_distribution = self.rng.multinomial(number_groups, avg_fitness / avg_fitness.sum())
 
 
             # Update the new distribution of groups
@@ -63,24 +58,14 @@ class WrightFisher(DynamicsSimulator):
                 new_group_state =[]
                 for player_idx, (strategy_distribution, fitnesses, num_players) in enumerate(zip(previous_state[i], fitness[i], self.num_players)):
                     num_strats = len(strategy_distribution)
-                    total_mutations = 0
-                    new_player_state = np.zeros(num_strats)
-
-                    for strategy_idx, n in enumerate(strategy_distribution):
-                        f = fitnesses[strategy_idx]
-                        mu_individual = mu_matrix[player_idx][strategy_idx]
 
-                        # sample from binomial distribution to get number of mutations for strategy
-                        if n == 0:
-                            mutations = 0
-                        else:
-                            mutations = np.random.binomial(n, mu_individual)
-                        n -= mutations
-                        total_mutations += mutations
-                        new_player_state[strategy_idx] = n * f
+                    # sample from binomial distribution to get number of mutations for every strategy at once
+                    mutations = self.rng.binomial(np.asarray(strategy_distribution, dtype=np.int64), mu_matrix[player_idx])
+                    total_mutations = mutations.sum()
 
-                        # distribute player strategies proportional n * f
-                        # don't use multinomial, because that adds randomness we don't want yet.
+                    # distribute player strategies proportional n * f
+                    # don't use multinomial, because that adds randomness we don't want yet.
+                    new_player_state = (strategy_distribution - mutations) * fitnesses
 
                     if new_player_state.sum() != 0:
                         new_player_state *= float(num_players - total_mutations) / new_player_state.sum()
@@ -89,7 +74,7 @@ class WrightFisher(DynamicsSimulator):
                     else: # Make sure that mutations get randomly distributed if they lead to a zero population size
                         new_player_state = np.zeros(num_strats)
 
-                    new_player_state += np.random.multinomial(total_mutations, [1. / num_strats] * num_strats)
+                    new_player_state += self.rng.multinomial(total_mutations, [1. / num_strats] * num_strats)
                     new_group_state.append(new_player_state)
                 next_state.append(new_group_state)
 
@@ -1,4 +1,6 @@
 from joblib import Parallel, delayed
+import copy
+import numpy as np
 
 
 PARALLEL_ENABLED = True #: Whether or not parallelization should be enabled for the library
@@ -37,3 +39,15 @@ def wrapper_vary_for_kwargs(wrapper, *args, **kwargs):
     so that multiple simulations can be run in parallel. This function does not need to be called directly.
     """
     return wrapper._vary_for_kwargs(*args, **kwargs)
+
+
+def dynamics_simulate(dyn, seed, *args, **kwargs):
+    """
+    The globally importable counterpart of the L{DynamicsSimulator} class's simulate method, used by its simulate_many
+    method to run independent simulations in parallel. The simulation runs on a shallow copy of the simulator with its
+    own random number generator seeded from the given seed sequence, so that every simulation draws from an independent
+    stream. This function does not need to be called directly.
+    """
+    dyn = copy.copy(dyn)
+    dyn.rng = np.random.default_rng(seed)
+    return dyn.simulate(*args, **kwargs)
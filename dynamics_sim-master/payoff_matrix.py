@@ -78,7 +78,7 @@ class PayoffMatrix(object):
         @rtype: float
         """
         current=numpy.asarray(current_state[player_idx])
-        current_freq=current/sum(current)
+        current_freq=current/current.sum()
         
         # Defining the default function as developed by Nakahashi with a=1. This should be modified according to the nature of the fitness function and the strength of the bias being considered.
         a = 1
@@ -115,18 +115,20 @@ class PayoffMatrix(object):
             # iterate over the current player idx dimension, recursively calling yourself on every iteration
             if len(current_state) == 1:  # Single population game
                 payoff = 0
+                total = float(current_state[0].sum())
                 for strat in range(self.num_strats[0]):
                     n = current_state[0][strat]
-                    p = float(n) / current_state[0].sum()
+                    p = n / total
                     dict_copy = other_player_strategies.copy()
                     dict_copy[current_player_idx] = strat
                     payoff += self._iterate_through_players(target_player_idx, current_player_idx + 1, dict_copy, probability * p, current_state)
                 return payoff
             else:
                 payoff = 0
+                total = float(current_state[current_player_idx].sum())
                 for strat in range(self.num_strats[current_player_idx]):
                     n = current_state[current_player_idx][strat]
-                    p = float(n) / current_state[current_player_idx].sum()
+                    p = n / total
                     dict_copy = other_player_strategies.copy()
                     dict_copy[current_player_idx] = strat
                     payoff += self._iterate_through_players(target_player_idx, current_player_idx + 1, dict_copy, probability * p, current_state)
@@ -108,19 +108,15 @@ class GameDynamicsWrapper(object):
             classifications = []
 
             if class_end:  # Only classify the final generation
-                lastGenerationState = [np.zeros(len(player[0])) for player in results_total]
-                for playerIdx, player in enumerate(results_total):
-                    for stratIdx, strat in enumerate(player[-1]):
-                        lastGenerationState[playerIdx][stratIdx] = strat
-                    lastGenerationState[playerIdx] /= lastGenerationState[playerIdx].sum()
+                lastGenerationState = [player[-1] / player[-1].sum() for player in results_total]
                 equi = game.classify(params, lastGenerationState, game.equilibrium_tolerance)
                 frequencies = np.zeros(self.game_cls.num_equilibria())
                 frequencies[equi] = 1
 
             else: # Classify every generation
 
-                for state in zip(*results_total):
-                    state = [x / x.sum() for x in state]
+                normalized_total = [player / player.sum(axis=1, keepdims=True) for player in results_total]
+                for state in zip(*normalized_total):
                     equi = game.classify(params, state, game.equilibrium_tolerance)
                     # note, if equi returns -1, then the -1 index gets the last entry in the array
                     classifications.append(equi)
@@ -196,32 +192,27 @@ class GameDynamicsWrapper(object):
         # Storing the final strategy populations per iteration
         strat_final = [np.zeros(shape=(num_iterations, dyn.pm.num_strats[playerIdx])) for playerIdx in range(dyn.pm.num_player_types)]
 
-        for iteration in range(num_iterations):
-            for player in range(dyn.pm.num_player_types):
-                for gen in range(num_gens - burn):
-                    for strat in range(dyn.pm.num_strats[player]):
-                        stratAvg[player][gen][strat] += strategies[iteration][player][gen][strat]
-                        if histogram and gen == num_gens - burn - 1:
-                            strat_final[player][iteration][strat] += strategies[iteration][player][gen][strat]
+        for player in range(dyn.pm.num_player_types):
+            # stack the iterations of each player type, so that the sums over iterations are single reductions
+            player_strategies = np.array([s[player] for s in strategies])
+            stratAvg[player][:num_gens - burn] = player_strategies[:, :num_gens - burn].sum(axis=0)
+            if histogram:
+                strat_final[player] = player_strategies[:, num_gens - burn - 1].copy()
 
         for playerIdx, player in enumerate(stratAvg):
-            for genIdx, gen in enumerate(player):
-                if gen.sum() != 0:
-                    gen /= gen.sum()
-                    gen *= dyn.num_players[playerIdx]
+            gen_totals = player.sum(axis=1, keepdims=True)
+            np.divide(player, gen_totals, out=player, where=gen_totals != 0)
+            player *= dyn.num_players[playerIdx]
 
         payoffsAvg = [np.zeros(shape=(num_gens -1, dyn.pm.num_strats[playerIdx])) for playerIdx in range(dyn.pm.num_player_types)]
-        for iteration in range(num_iterations):
-            for player in range(dyn.pm.num_player_types):
-                for gen in range(num_gens -1 - burn):
-                    for strat in range(dyn.pm.num_strats[player]):
-                        payoffsAvg[player][gen][strat] += payoffs[iteration][player][gen][strat]
+        for player in range(dyn.pm.num_player_types):
+            player_payoffs = np.array([p[player] for p in payoffs])
+            payoffsAvg[player][:num_gens - 1 - burn] = player_payoffs[:, :num_gens - 1 - burn].sum(axis=0)
 
         for playerIdx, player in enumerate(payoffsAvg):
-            for genIdx, gen in enumerate(player):
-                if gen.sum() != 0:
-                    gen /= gen.sum()
-                    gen *= dyn.num_players[playerIdx]
+            gen_totals = player.sum(axis=1, keepdims=True)
+            np.divide(player, gen_totals, out=player, where=gen_totals != 0)
+            player *= dyn.num_players[playerIdx]
 
         if graph:
             assert histogram == False, ("Can't plot graph and histogram at the same time")